@@ -5,11 +5,13 @@ Generate a paginated 8.5×14 (US Legal) PDF from the RHF Website Consolidation p
 Three-stage process:
   1. Playwright + Chromium renders HTML to PDF (11×14, no footer)
   2. PyMuPDF post-processes to add branded footer on every page
-  3. PyMuPDF screenshots every page for visual QA
+  3. PyMuPDF screenshots pages for visual QA (all, a sample, or changed only)
 """
 
-import asyncio, re
+import asyncio, hashlib, json, multiprocessing, os, re, sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
 from pathlib import Path
 from playwright.async_api import async_playwright
 import fitz  # PyMuPDF
@@ -21,6 +23,20 @@ BASE_DIR = Path(__file__).resolve().parent
 HTML_PATH = BASE_DIR / "index.html"
 OUTPUT_PATH = BASE_DIR / "Inkline-RHF-Website-Consolidation-Proposal.pdf"
 SCREENSHOT_DIR = Path("/sessions/hopeful-focused-feynman/pdf_pages")
+IMAGE_CACHE_DIR = BASE_DIR / "build" / "img"
+
+# QA screenshots are for eyeballing layout, so skip PNG deflate and emit JPEG
+SCREENSHOT_JPG_QUALITY = 80
+# Below this many pages, rendering in-process beats starting a worker pool
+MIN_POOL_PAGES = 8
+
+# Which pages Stage 3 renders (override with --qa=MODE):
+#   "all"    - every page
+#   "sample" - first, last and each page that starts a section
+#   "diff"   - only pages whose content changed since the previous build
+QA_MODE = "all"
+QA_MODES = ("all", "sample", "diff")
+QA_STATE_FILE = ".hashes.json"
 
 # ---------------------------------------------------------------------------
 # Page setup  -  8.5 × 14 inches  (US Legal)
@@ -38,6 +54,23 @@ MARGIN_RIGHT = "0mm"
 MARGIN_BOTTOM = f"{FOOTER_H_MM + 4}mm"   # footer + 4mm breathing room
 MARGIN_LEFT = "0mm"
 
+# Embedded images are downscaled to at most twice the page width at QA
+# resolution (8.5in @ 110 dpi) before Chromium sees them
+MAX_IMAGE_PX = round(2 * 8.5 * 110)
+IMAGE_JPG_QUALITY = 82
+
+# IDs of sections that should start on a new page
+SECTION_BREAK_IDS = [
+    "approach",        # Strategic Approach
+    "ia",              # Information Architecture
+    "seo",             # SEO & AEO
+    "considerations",  # Key Considerations
+    "scope",           # Technical Scope
+    "effort",          # Effort & Investment
+    "company",         # About Inkline
+    "next-steps",      # Next Steps
+]
+
 # ---------------------------------------------------------------------------
 # Colours  (RGB 0-1 floats for PyMuPDF)
 # ---------------------------------------------------------------------------
@@ -213,6 +246,7 @@ PRINT_CSS = """
   }
   .portfolio-card.pdf-expanded .portfolio-info {
     padding: 1rem 1.25rem !important;
+    contain: layout paint !important;   /* keep expansion reflow local */
   }
   .portfolio-card.pdf-expanded .portfolio-name {
     font-size: 1rem !important;
@@ -284,13 +318,117 @@ PRINT_CSS = """
 """
 
 
+# ===========================================================================
+#  HTML preprocessing  -  applied in Python before Chromium parses the page
+# ===========================================================================
+def _add_class(tag: str, cls: str) -> str:
+    """Add `cls` to an opening tag, merging with any existing class attribute.
+
+    Handles double-quoted, single-quoted and unquoted class values.
+    """
+    m = re.search(r"""\sclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""", tag)
+    if m:
+        group = next(g for g in (1, 2, 3) if m.group(g) is not None)
+        if cls in m.group(group).split():
+            return tag
+        if group == 3:
+            # Unquoted values can't hold a space, so rewrite them double-quoted
+            return tag[:m.start(3)] + f'"{m.group(3)} {cls}"' + tag[m.end(3):]
+        return tag[:m.end(group)] + " " + cls + tag[m.end(group):]
+    return re.sub(r"^<(\w+)", rf'<\1 class="{cls}"', tag, count=1)
+
+
+def mark_section_breaks(html: str):
+    """Add the pdf-section-break class to each section that starts a page.
+
+    Returns the rewritten HTML and the number of sections marked.
+    """
+    marked = 0
+
+    def mark(m):
+        nonlocal marked
+        tag = _add_class(m.group(0), "pdf-section-break")
+        marked += tag != m.group(0)
+        return tag
+
+    for id_ in SECTION_BREAK_IDS:
+        html = re.sub(rf'<\w+[^>]*\sid="{re.escape(id_)}"[^>]*>', mark, html, count=1)
+
+    # Also break before the next-steps gradient section
+    html = re.sub(r'<section\b[^>]*style="[^"]*linear-gradient[^>]*>', mark, html, count=1)
+    return html, marked
+
+
+def _optimized_image(src: Path) -> Path:
+    """Downscale/transcode one image into IMAGE_CACHE_DIR, reusing fresh copies."""
+    # Key on a hash of the full relative path (suffix included) so no two
+    # sources share a copy, and on the settings so changing them never serves
+    # old copies; the source stem is kept only for readability
+    rel = src.relative_to(BASE_DIR).as_posix()
+    key = hashlib.blake2b(rel.encode(), digest_size=6).hexdigest()
+    stem = f"{src.stem}-{key}-{MAX_IMAGE_PX}q{IMAGE_JPG_QUALITY}"
+    for out in (IMAGE_CACHE_DIR / f"{stem}.jpg", IMAGE_CACHE_DIR / f"{stem}.png"):
+        if out.exists() and out.stat().st_mtime >= src.stat().st_mtime:
+            return out
+
+    pix = fitz.Pixmap(str(src))
+    if pix.width > MAX_IMAGE_PX:
+        pix = fitz.Pixmap(pix, MAX_IMAGE_PX, round(pix.height * MAX_IMAGE_PX / pix.width), None)
+    # Opaque images become JPEG; keep PNG where transparency matters
+    if pix.alpha:
+        out, data = IMAGE_CACHE_DIR / f"{stem}.png", pix.tobytes("png")
+    else:
+        out, data = IMAGE_CACHE_DIR / f"{stem}.jpg", pix.tobytes("jpg", jpg_quality=IMAGE_JPG_QUALITY)
+    IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    out.write_bytes(data)
+    return out
+
+
+def optimize_images(html: str):
+    """Point <img> tags at downscaled copies of large local PNG/JPEG files.
+
+    Returns the rewritten HTML and the number of images replaced.
+    """
+    replaced = 0
+    srcs = set(re.findall(r'<img\b[^>]*\ssrc="([^"]+)"', html))
+    for src in sorted(srcs):
+        path = (HTML_PATH.parent / src).resolve()
+        if path.suffix.lower() not in (".png", ".jpg", ".jpeg") or not path.is_file() \
+                or BASE_DIR not in path.parents:
+            continue
+        out = _optimized_image(path)
+        # Only swap when the copy is actually smaller than the original
+        if out.stat().st_size < path.stat().st_size:
+            new_src = out.relative_to(HTML_PATH.parent).as_posix()
+            html = html.replace(f'src="{src}"', f'src="{new_src}"')
+            replaced += 1
+    return html, replaced
+
+
+def prepare_html(html: str):
+    """Embed the print CSS, mark section breaks and drop lazy loading.
+
+    Returns the rewritten HTML, the number of lazy images fixed and the
+    number of sections marked with page breaks.
+    """
+    html, lazy_fixed = re.subn(r'\s+loading="lazy"', "", html)
+    html, marked = mark_section_breaks(html)
+    html = html.replace("</head>", PRINT_CSS + "</head>", 1)
+    return html, lazy_fixed, marked
+
+
 # ===========================================================================
 #  Stage 2: Add branded footer to every page via PyMuPDF
 # ===========================================================================
-def add_branded_footer(pdf_path: Path):
-    doc = fitz.open(str(pdf_path))
+def add_branded_footer(doc: fitz.Document):
     total = len(doc)
 
+    # Text and timestamp are identical on every page, so build them once
+    left_txt = "Inkline + Attention Strategy  \u00b7  Rideau Hall Foundation Website Consolidation  \u00b7  Confidential"
+    version_ts = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+    prefix = f"Version: {version_ts}  \u00b7  "
+    pw = fitz.get_text_length(prefix, fontname="helv", fontsize=6.5)
+
     for i in range(total):
         page = doc[i]
         r = page.rect
@@ -303,15 +441,13 @@ def add_branded_footer(pdf_path: Path):
         cy = r.height - FOOTER_H_PT / 2 + 2
 
         # -- Left text --
-        left_txt = "Inkline + Attention Strategy  \u00b7  Rideau Hall Foundation Website Consolidation  \u00b7  Confidential"
+        # Base-14 Helvetica via insert_text is only referenced, never
+        # embedded; TextWriter would embed a full font program per document
         page.insert_text(fitz.Point(28, cy), left_txt,
                          fontname="helv", fontsize=6.5, color=GREY_MED)
 
         # -- Right text: date saved + page number --
-        version_ts = datetime.now().strftime("%B %d, %Y at %I:%M %p")
-        prefix = f"Version: {version_ts}  \u00b7  "
         pgtxt = f"Page {i + 1} of {total}"
-        pw = fitz.get_text_length(prefix, fontname="helv", fontsize=6.5)
         gw = fitz.get_text_length(pgtxt, fontname="helv", fontsize=6.5)
         rx = r.width - 28 - pw - gw
 
@@ -320,185 +456,354 @@ def add_branded_footer(pdf_path: Path):
         page.insert_text(fitz.Point(rx + pw, cy), pgtxt,
                          fontname="helv", fontsize=6.5, color=CERULEAN)
 
-    # Save to temp then replace
-    tmp_out = str(pdf_path) + ".tmp"
-    doc.save(tmp_out, deflate=True)
-    doc.close()
-    Path(tmp_out).replace(pdf_path)
     print(f"  Footer added to {total} pages")
 
 
 # ===========================================================================
 #  Stage 3: Screenshot every page for visual QA
 # ===========================================================================
-def screenshot_pages(pdf_path: Path, out_dir: Path, dpi: int = 110):
-    out_dir.mkdir(parents=True, exist_ok=True)
-    for f in out_dir.glob("page_*.png"):
-        f.unlink()
+def _rasterize(doc: fitz.Document, pages, zoom: float, out_dir: Path) -> int:
+    mat = fitz.Matrix(zoom, zoom)
+    for i in pages:
+        pix = doc[i].get_pixmap(matrix=mat)
+        out = out_dir / f"page_{i + 1:02d}.jpg"
+        out.write_bytes(pix.tobytes("jpg", jpg_quality=SCREENSHOT_JPG_QUALITY))
+    return len(pages)
+
 
+def _render_pages(pdf_path: Path, pages: list, zoom: float, out_dir: Path) -> int:
+    """Worker: open the PDF once and rasterize the given page indices."""
     doc = fitz.open(str(pdf_path))
+    count = _rasterize(doc, pages, zoom, out_dir)
+    doc.close()
+    return count
+
+
+def _page_index(path: Path):
+    """Page index of a screenshot file, or None for unrelated files."""
+    m = re.fullmatch(r"page_(\d+)\.(png|jpg)", path.name)
+    return int(m.group(1)) - 1 if m else None
+
+
+def screenshot_pages(doc: fitz.Document, pdf_path: Path, out_dir: Path,
+                     pages=None, keep=(), dpi: int = 110):
+    """Rasterize `pages` (default: all) into out_dir.
+
+    Existing screenshots are cleared unless their page index is in `keep`.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    keep = set(keep)
+    for f in out_dir.glob("page_*.*"):
+        idx = _page_index(f)
+        if idx is not None and idx not in keep:
+            f.unlink()
+
+    pages = list(range(len(doc)) if pages is None else pages)
+    count = len(pages)
     zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
 
-    count = len(doc)
-    for i in range(count):
-        pix = doc[i].get_pixmap(matrix=mat)
-        out = out_dir / f"page_{i + 1:02d}.png"
-        pix.save(str(out))
+    # Rasterization is CPU-bound and PyMuPDF documents are not thread-safe,
+    # so fan pages out across processes, each with its own open document.
+    # Starting workers means re-importing this module and re-opening the PDF,
+    # so for a handful of pages (or a single core) render straight from the
+    # already-open document instead.
+    workers = max(1, min(os.cpu_count() or 1, count))
+    if workers == 1 or count < MIN_POOL_PAGES:
+        rendered = _rasterize(doc, pages, zoom, out_dir)
+    else:
+        chunks = [pages[w::workers] for w in range(workers)]
+        # Never fork: this runs on a worker thread next to the asyncio loop and
+        # the Playwright driver, and forking a multi-threaded process can deadlock
+        ctx = multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            rendered = sum(pool.map(_render_pages, repeat(pdf_path), chunks,
+                                    repeat(zoom), repeat(out_dir)))
+
+    print(f"  Saved {rendered} page screenshots to {out_dir}")
+
+
+def page_hashes(doc: fitz.Document) -> list:
+    """Hash each page's content streams and the images and XObjects it uses.
+
+    Images are referenced by name from the content stream, so their own
+    streams must be hashed too or a swapped image would look unchanged.
+    """
+    hashes = []
+    for page in doc:
+        h = hashlib.blake2b(digest_size=16)
+        for xref in page.get_contents():
+            h.update(doc.xref_stream(xref) or b"")
+        # Image xrefs plus their soft masks, so transparency changes count too
+        refs = set()
+        for img in page.get_images(full=True):
+            refs.add(img[0])
+            if img[1]:
+                refs.add(img[1])
+        refs |= {xobj[0] for xobj in page.get_xobjects()}
+        for xref in sorted(refs):
+            h.update(doc.xref_stream_raw(xref) or b"")
+        hashes.append(h.hexdigest())
+    return hashes
+
+
+def section_start_pages(doc: fitz.Document, titles) -> list:
+    """Indices of pages whose top third contains one of the section titles."""
+    wanted = [" ".join(t.split()) for t in titles if t.strip()]
+    found = []
+    for i, page in enumerate(doc):
+        r = page.rect
+        top = " ".join(page.get_text("text", clip=fitz.Rect(0, 0, r.width, r.height / 3)).split())
+        if any(t in top for t in wanted):
+            found.append(i)
+    return found
+
+
+def select_qa_pages(doc: fitz.Document, qa_mode: str, section_titles=(),
+                    old_state=None, hashes=None, dpi: int = 110):
+    """Decide which pages Stage 3 renders and which existing screenshots to keep.
+
+    Returns (pages, keep) as lists of page indices.
+    """
+    total = len(doc)
+    if qa_mode == "sample":
+        pages = {0, total - 1, *section_start_pages(doc, section_titles)}
+        return sorted(pages), []
+    if qa_mode == "diff" and old_state and hashes is not None \
+            and old_state.get("dpi") == dpi and len(old_state.get("hashes", [])) == total:
+        # Same page count means the "Page N of M" footer is unchanged too;
+        # only the version timestamp on kept screenshots goes stale
+        old = old_state["hashes"]
+        changed = [i for i in range(total) if hashes[i] != old[i]]
+        unchanged = [i for i in range(total) if hashes[i] == old[i]]
+        return changed, unchanged
+    return list(range(total)), []
+
 
+# ===========================================================================
+#  Stages 2 + 3: open the rendered PDF once for footer and screenshots
+# ===========================================================================
+def post_process(pdf_bytes: bytes, pdf_path: Path, out_dir: Path, qa_mode: str = QA_MODE,
+                 section_titles=(), dpi: int = 110):
+    # Chromium's output is kept in memory; only the final PDF touches disk
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+    # Hash Chromium's output before the footer (and its timestamp) is added
+    hashes = page_hashes(doc) if qa_mode == "diff" else None
+    state_path = out_dir / QA_STATE_FILE
+    old_state = None
+    if hashes is not None:
+        # A missing, truncated or malformed state file just means no baseline
+        try:
+            old_state = json.loads(state_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            pass
+        if not isinstance(old_state, dict):
+            old_state = None
+
+    print("\n=== Stage 2: PyMuPDF branded footer ===")
+    add_branded_footer(doc)
+    # Persist before rasterizing so worker processes see the final footer.
+    # Chromium already compressed its streams, so pass everything through
+    # verbatim; only the small footer streams are left uncompressed.
+    # Save to a sibling temp file then replace, so an interrupted save never
+    # leaves a truncated deliverable behind.
+    tmp_out = pdf_path.with_name(pdf_path.name + ".tmp")
+    doc.save(str(tmp_out), garbage=0, clean=False,
+             deflate=False, deflate_images=False, deflate_fonts=False)
+    tmp_out.replace(pdf_path)
+
+    print(f"\n=== Stage 3: Page screenshots for QA ({qa_mode}) ===")
+    pages, keep = select_qa_pages(doc, qa_mode, section_titles, old_state, hashes, dpi)
+    # Unchanged pages whose screenshot has gone missing still need rendering
+    missing = [i for i in keep if not (out_dir / f"page_{i + 1:02d}.jpg").exists()]
+    keep = [i for i in keep if i not in missing]
+    pages = sorted(pages + missing)
+    screenshot_pages(doc, pdf_path, out_dir, pages, keep, dpi)
+    if hashes is not None:
+        # Temp file + replace, like the PDF, so an interrupted write is harmless
+        tmp_state = state_path.with_name(state_path.name + ".tmp")
+        tmp_state.write_text(json.dumps({"dpi": dpi, "hashes": hashes}))
+        tmp_state.replace(state_path)
+    else:
+        # Screenshots no longer match the stored hashes; force a full diff next time
+        state_path.unlink(missing_ok=True)
+    if keep:
+        print(f"  Kept {len(keep)} unchanged page screenshots")
+
+    final_sz = pdf_path.stat().st_size / (1024 * 1024)
+    print(f"\n  Final: {len(doc)} pages, {final_sz:.1f} MB")
+    print(f"  Page size: {doc[0].rect.width:.0f} x {doc[0].rect.height:.0f} pts "
+          f"({doc[0].rect.width / 72:.1f}\" x {doc[0].rect.height / 72:.1f}\")")
     doc.close()
-    print(f"  Saved {count} page screenshots to {out_dir}")
+
+
+# ===========================================================================
+#  Shared Chromium instance  -  launched once, reused across builds
+# ===========================================================================
+# Playwright's headless launch already runs chrome-headless-shell (the "old"
+# headless implementation that is fast at page.pdf), so no --headless flag.
+# Its default args already cover --no-sandbox, --disable-dev-shm-usage,
+# --disable-extensions and --disable-background-networking, and it passes its
+# own --disable-features list, which a second --disable-features would replace.
+CHROMIUM_ARGS = [
+    "--disable-gpu",
+    "--font-render-hinting=none",
+]
+
+_playwright = None
+_browser = None
+_context = None
+
+
+async def get_browser():
+    """Return the module-level Chromium browser, launching it on first use."""
+    global _playwright, _browser
+    if _browser is None or not _browser.is_connected():
+        if _playwright is None:
+            _playwright = await async_playwright().start()
+        _browser = await _playwright.chromium.launch(
+            headless=True, chromium_sandbox=False, args=CHROMIUM_ARGS)
+    return _browser
+
+
+async def get_context(browser=None):
+    """Return a long-lived browser context so repeated builds only open a page."""
+    global _context
+    if browser is not None and browser is not _browser:
+        return await browser.new_context(viewport={"width": 1100, "height": 900})
+    browser = await get_browser()
+    if _context is None or _context.browser is not browser:
+        _context = await browser.new_context(viewport={"width": 1100, "height": 900})
+    return _context
+
+
+async def close_browser():
+    """Tear down the shared context, browser and Playwright driver."""
+    global _playwright, _browser, _context
+    if _context is not None:
+        await _context.close()
+        _context = None
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
 
 
 # ===========================================================================
 #  Stage 1: Playwright PDF generation
 # ===========================================================================
-async def generate_pdf():
+async def generate_pdf(browser=None, qa_mode: str = QA_MODE):
+    if qa_mode not in QA_MODES:
+        raise ValueError(f"qa_mode must be one of {QA_MODES}, got {qa_mode!r}")
     print("=== Stage 1: Playwright PDF generation (8.5\u00d714 Legal) ===")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page(viewport={"width": 1100, "height": 900})
-
-        # Load HTML from its actual location so relative paths (images, logos) work
-        file_url = f"file://{HTML_PATH.resolve()}"
-        print(f"  Loading: {file_url}")
-        await page.goto(file_url, wait_until="networkidle", timeout=60000)
-
-        print("  Waiting for page render...")
-        await page.wait_for_timeout(3000)
-
-        # Remove lazy loading from all images so they render in PDF
-        lazy_fixed = await page.evaluate("""() => {
-            let count = 0;
-            document.querySelectorAll('img[loading="lazy"]').forEach(img => {
-                img.removeAttribute('loading');
-                // Force reload by re-setting src
-                const src = img.src;
-                img.src = '';
-                img.src = src;
-                count++;
-            });
-            return count;
-        }""")
+    context = await get_context(browser)
+    page = await context.new_page()
+    try:
+        # Start from the HTML file's directory so the page has a file:// origin
+        # and relative paths (images, logos) resolve, then hand Chromium the
+        # already print-ready markup instead of navigating to the file
+        html, lazy_fixed, marked = prepare_html(HTML_PATH.read_text(encoding="utf-8"))
         print(f"  Removed lazy loading from {lazy_fixed} images")
-
-        # Wait for local images to load
-        await page.wait_for_timeout(2000)
-
-        # Inject print CSS
-        await page.evaluate("""(css) => {
-            document.head.insertAdjacentHTML('beforeend', css);
-        }""", PRINT_CSS)
-
-        # Add page breaks before major sections only (not every section)
-        marked = await page.evaluate("""() => {
-            // IDs of sections that should start on a new page
-            const breakIds = [
-                'approach',        // Strategic Approach
-                'ia',              // Information Architecture
-                'seo',             // SEO & AEO
-                'considerations',  // Key Considerations
-                'scope',           // Technical Scope
-                'effort',          // Effort & Investment
-                'company',         // About Inkline
-                'next-steps',      // Next Steps
-            ];
-            let marked = 0;
-            breakIds.forEach(id => {
-                const el = document.getElementById(id);
-                if (el) {
-                    el.classList.add('pdf-section-break');
-                    marked++;
-                }
-            });
-
-            // Also break before the next-steps gradient section
-            const nextSection = document.querySelector('section[style*="linear-gradient"]');
-            if (nextSection && !nextSection.classList.contains('pdf-section-break')) {
-                nextSection.classList.add('pdf-section-break');
-                marked++;
-            }
-
-            return marked;
-        }""")
         print(f"  Marked {marked} sections with page breaks")
-
-        # Expand portfolio cards into hybrid layout with narrative + relevance
-        # portfolioData is inside an IIFE, so extract it from the script tag text
-        expanded = await page.evaluate("""() => {
-            // portfolioData is in an IIFE — extract via brace counting
-            let portfolioData = null;
-            const scripts = document.querySelectorAll('script:not([src])');
-            for (const s of scripts) {
-                const txt = s.textContent;
-                const idx = txt.indexOf('const portfolioData = {');
-                if (idx < 0) continue;
-                const startIdx = txt.indexOf('{', idx);
-                let braceCount = 0;
-                let endIdx = startIdx;
-                for (let i = startIdx; i < txt.length; i++) {
-                    if (txt[i] === '{') braceCount++;
-                    if (txt[i] === '}') braceCount--;
-                    if (braceCount === 0) { endIdx = i; break; }
-                }
-                const objStr = txt.substring(startIdx, endIdx + 1);
-                try { portfolioData = eval('(' + objStr + ')'); } catch(e) { console.error(e); }
-                break;
+        html, optimized = optimize_images(html)
+        print(f"  Downscaled {optimized} images (max {MAX_IMAGE_PX}px wide)")
+        print(f"  Loading: {HTML_PATH}")
+        await page.goto(f"file://{HTML_PATH.resolve().parent}/", timeout=60000)
+        await page.set_content(html, wait_until="domcontentloaded", timeout=60000)
+
+        # Prepare the page in a single round-trip: collect section titles,
+        # expand portfolio cards, then wait for fonts and images
+        print("  Preparing page for print...")
+        stats = await page.evaluate("""async () => {
+            // -- Titles of the sections marked with page breaks in Python
+            const sectionTitles = Array.from(document.querySelectorAll('.pdf-section-break'))
+                .map(sec => sec.querySelector('h2'))
+                .filter(Boolean)
+                .map(h => h.textContent);
+
+            // -- Expand portfolio cards into hybrid layout with narrative + relevance
+            // portfolioData is published on window by the lightbox script
+            const portfolioData = window.portfolioData;
+            let expanded = 0;
+            if (portfolioData) {
+                document.querySelectorAll('.portfolio-card').forEach(card => {
+                    const nameEl = card.querySelector('.portfolio-name');
+                    if (!nameEl) return;
+                    const name = nameEl.textContent.trim();
+                    const data = portfolioData[name];
+                    if (!data) return;
+
+                    card.classList.add('pdf-expanded');
+
+                    const info = card.querySelector('.portfolio-info');
+                    if (!info) return;
+
+                    // Build the additions off-DOM and attach them in one go
+                    const frag = document.createDocumentFragment();
+
+                    // Add narrative
+                    const narDiv = document.createElement('div');
+                    narDiv.className = 'pdf-narrative';
+                    narDiv.textContent = data.narrative;
+                    frag.appendChild(narDiv);
+
+                    // Add relevance label + text
+                    const relLabel = document.createElement('div');
+                    relLabel.className = 'pdf-relevance-label';
+                    relLabel.textContent = 'Relevance to RHF Project';
+                    frag.appendChild(relLabel);
+
+                    const relDiv = document.createElement('div');
+                    relDiv.className = 'pdf-relevance';
+                    relDiv.textContent = data.relevance;
+                    frag.appendChild(relDiv);
+
+                    // Add RFP reference tags
+                    if (data.refs && data.refs.length) {
+                        const refsDiv = document.createElement('div');
+                        refsDiv.className = 'pdf-refs';
+                        data.refs.forEach(r => {
+                            const tag = document.createElement('span');
+                            tag.className = 'pdf-ref-tag';
+                            tag.textContent = r;
+                            refsDiv.appendChild(tag);
+                        });
+                        frag.appendChild(refsDiv);
+                    }
+                    info.appendChild(frag);
+                    expanded++;
+                });
             }
-            if (!portfolioData) return 0;
-            const cards = document.querySelectorAll('.portfolio-card');
-            let count = 0;
-            cards.forEach(card => {
-                const nameEl = card.querySelector('.portfolio-name');
-                if (!nameEl) return;
-                const name = nameEl.textContent.trim();
-                const data = portfolioData[name];
-                if (!data) return;
-
-                card.classList.add('pdf-expanded');
-
-                const info = card.querySelector('.portfolio-info');
-                if (!info) return;
-
-                // Add narrative
-                const narDiv = document.createElement('div');
-                narDiv.className = 'pdf-narrative';
-                narDiv.textContent = data.narrative;
-                info.appendChild(narDiv);
-
-                // Add relevance label + text
-                const relLabel = document.createElement('div');
-                relLabel.className = 'pdf-relevance-label';
-                relLabel.textContent = 'Relevance to RHF Project';
-                info.appendChild(relLabel);
-
-                const relDiv = document.createElement('div');
-                relDiv.className = 'pdf-relevance';
-                relDiv.textContent = data.relevance;
-                info.appendChild(relDiv);
-
-                // Add RFP reference tags
-                if (data.refs && data.refs.length) {
-                    const refsDiv = document.createElement('div');
-                    refsDiv.className = 'pdf-refs';
-                    data.refs.forEach(r => {
-                        const tag = document.createElement('span');
-                        tag.className = 'pdf-ref-tag';
-                        tag.textContent = r;
-                        refsDiv.appendChild(tag);
-                    });
-                    info.appendChild(refsDiv);
-                }
-                count++;
+
+            // -- Wait for web fonts (including any the expanded cards need),
+            //    every <img>, and CSS background images such as the hub-spoke
+            //    program icons, which <img>.decode() does not cover
+            document.body.offsetHeight;  // force layout so new text requests its fonts
+            const bgUrls = new Set();
+            document.querySelectorAll('[style*="background-image"]').forEach(el => {
+                const bg = getComputedStyle(el).backgroundImage;
+                for (const m of bg.matchAll(/url\\(["']?(.*?)["']?\\)/g)) bgUrls.add(m[1]);
             });
-            return count;
+            await Promise.all([
+                document.fonts.ready,
+                ...Array.from(document.images).map(img => img.decode().catch(() => 0)),
+                ...Array.from(bgUrls).map(url => {
+                    const img = new Image();
+                    img.src = url;
+                    return img.decode().catch(() => 0);
+                }),
+            ]);
+
+            return {expanded, sectionTitles};
         }""")
-        print(f"  Expanded {expanded} portfolio cards for PDF")
+        print(f"  Expanded {stats['expanded']} portfolio cards for PDF")
 
         print("  Rendering PDF...")
-        await page.pdf(
-            path=str(OUTPUT_PATH),
+        pdf_bytes = await page.pdf(
             width=PAGE_WIDTH,
             height=PAGE_HEIGHT,
             print_background=True,
@@ -511,26 +816,47 @@ async def generate_pdf():
             },
             prefer_css_page_size=False,
         )
-        await browser.close()
 
-    sz = OUTPUT_PATH.stat().st_size / (1024 * 1024)
-    print(f"  PDF: {OUTPUT_PATH.name}  ({sz:.1f} MB)")
+        sz = len(pdf_bytes) / (1024 * 1024)
+        print(f"  PDF rendered in memory  ({sz:.1f} MB)")
 
-    # --- Stage 2: Footer ---
-    print("\n=== Stage 2: PyMuPDF branded footer ===")
-    add_branded_footer(OUTPUT_PATH)
+    finally:
+        await page.close()
+        if context is not _context:
+            await context.close()
 
-    # --- Stage 3: Screenshots ---
-    print("\n=== Stage 3: Page screenshots for QA ===")
-    screenshot_pages(OUTPUT_PATH, SCREENSHOT_DIR)
+    # Stages 2 + 3 are blocking PyMuPDF work; keep them off the event loop
+    await asyncio.to_thread(post_process, pdf_bytes, OUTPUT_PATH, SCREENSHOT_DIR,
+                            qa_mode, stats["sectionTitles"])
 
-    final_sz = OUTPUT_PATH.stat().st_size / (1024 * 1024)
-    doc = fitz.open(str(OUTPUT_PATH))
-    print(f"\n  Final: {len(doc)} pages, {final_sz:.1f} MB")
-    print(f"  Page size: {doc[0].rect.width:.0f} x {doc[0].rect.height:.0f} pts "
-          f"({doc[0].rect.width / 72:.1f}\" x {doc[0].rect.height / 72:.1f}\")")
-    doc.close()
+
+# ===========================================================================
+#  Entry point  -  single build, or `--watch` to rebuild on HTML changes
+# ===========================================================================
+async def main(watch: bool = False, qa_mode: str = QA_MODE):
+    try:
+        await generate_pdf(qa_mode=qa_mode)
+        if not watch:
+            return
+        mtime = HTML_PATH.stat().st_mtime
+        print(f"\nWatching {HTML_PATH.name} for changes (Ctrl+C to stop)...")
+        while True:
+            await asyncio.sleep(1)
+            current = HTML_PATH.stat().st_mtime
+            if current != mtime:
+                mtime = current
+                print()
+                await generate_pdf(qa_mode=qa_mode)
+    finally:
+        await close_browser()
 
 
 if __name__ == "__main__":
-    asyncio.run(generate_pdf())
+    try:
+        args = sys.argv[1:]
+        qa_mode = next((a.split("=", 1)[1] for a in args if a.startswith("--qa=")), QA_MODE)
+        if qa_mode not in QA_MODES:
+            sys.exit(f"--qa must be one of: {', '.join(QA_MODES)} (got {qa_mode!r})")
+        asyncio.run(main(watch="--watch" in args, qa_mode=qa_mode))
+    except KeyboardInterrupt:
+        pass